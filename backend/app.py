@@ -6,82 +6,289 @@ Created on Thu Jun 26 20:23:32 2025
 @author: ashwanthelangovan
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
+import functools
 import math
 import os
+import pickle
+import queue
+import threading
+import time
 import joblib
 import numpy as np
+import orjson
+try:
+	import treelite_runtime
+except ImportError:  # optional: compiled forest evaluator (treelite 3.x API)
+	treelite_runtime = None
+try:
+	from numba import njit
+except ImportError:  # optional: JIT for the rule-based predictor
+	def njit(*args, **kwargs):
+		if args and callable(args[0]):
+			return args[0]
+		return lambda func: func
 from weather_service import get_current_temperature, get_weather_info, weather_service
 
 app = Flask(__name__)
 
+def ojson(obj, status=200):
+	"""JSON response encoded with orjson (handles NumPy scalars/arrays natively)"""
+	return app.response_class(
+		orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+		status=status,
+		mimetype="application/json",
+	)
+
 # ─── Load trained model if available ────────────────────────────────────────────
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "rf_model.pkl")
 REAL_MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "real_rf_model.pkl")
+REAL_MODEL_LIB_PATH = os.path.join(os.path.dirname(__file__), "models", "real_rf_model.so")
 trained_model = None
+compiled_predictor = None
 model_type = "rule-based"
 
-# Try to load real model first, then synthetic model
-for model_path, model_name in [(REAL_MODEL_PATH, "real"), (MODEL_PATH, "synthetic")]:
-    if os.path.exists(model_path):
-        try:
-            trained_model = joblib.load(model_path)
-            model_type = model_name
-            print(f"✅ Loaded {model_name} trained model from {model_path}")
-            break
-        except Exception as e:
-            print(f"⚠️  Failed to load {model_name} model: {e}")
-
-if trained_model is None:
-    print(f"⚠️  No trained model found")
-    print(f"   Looking for: {REAL_MODEL_PATH} or {MODEL_PATH}")
-    print(f"   Using rule-based predictor. Run 'python backend/train_real_model.py' or 'python backend/train_model.py'")
+def _model_predict(features):
+	"""Predict with the treelite-compiled forest when loaded, else with scikit-learn"""
+	if compiled_predictor is not None:
+		return np.ravel(compiled_predictor.predict(treelite_runtime.DMatrix(features)))
+	return trained_model.predict(features)
+
+# ─── Micro-batching: concurrent requests share one model.predict call ─────────
+BATCH_MAX_ROWS = 64
+BATCH_WINDOW_S = 0.005
+BATCH_WAIT_S = 0.1
+prediction_queue = queue.Queue()
+_batch_worker_lock = threading.Lock()
+_batch_worker_started = False
+# Requests that have announced a row but whose row the worker hasn't taken yet
+_pending_rows = 0
+_pending_lock = threading.Lock()
+
+def _take_row(block=True, timeout=None):
+	global _pending_rows
+	item = prediction_queue.get(block, timeout)
+	with _pending_lock:
+		_pending_rows -= 1
+	return item
+
+def _batch_worker():
+	"""Drain queued feature rows and resolve them with a single predict call"""
+	while True:
+		items = [_take_row()]
+		deadline = time.monotonic() + BATCH_WINDOW_S
+		while len(items) < BATCH_MAX_ROWS:
+			try:
+				# Whatever is already queued joins this batch for free
+				items.append(_take_row(block=False))
+				continue
+			except queue.Empty:
+				pass
+			# Only hold the batch open while another request is about to enqueue;
+			# a lone serial caller is flushed immediately
+			remaining = deadline - time.monotonic()
+			if _pending_rows <= 0 or remaining <= 0:
+				break
+			try:
+				items.append(_take_row(timeout=remaining))
+			except queue.Empty:
+				break
+		try:
+			preds = _model_predict(np.vstack([features for features, _, _ in items]))
+			for (_, _, result_holder), pred in zip(items, preds):
+				result_holder.append(float(pred))
+		except Exception as e:
+			print(f"⚠️  Batched prediction failed: {e}")
+		finally:
+			for _, event, _ in items:
+				event.set()
+
+def _ensure_batch_worker():
+	# Started lazily so each (possibly forked) server process gets its own thread
+	global _batch_worker_started
+	if _batch_worker_started:
+		return
+	with _batch_worker_lock:
+		if not _batch_worker_started:
+			threading.Thread(target=_batch_worker, daemon=True).start()
+			_batch_worker_started = True
+
+def batched_predict(features) -> float:
+	"""Queue a 1-row feature array for the batch worker and wait for its result"""
+	global _pending_rows
+	_ensure_batch_worker()
+	event = threading.Event()
+	result_holder = []
+	with _pending_lock:
+		_pending_rows += 1
+	prediction_queue.put((features, event, result_holder))
+	if event.wait(timeout=BATCH_WAIT_S) and result_holder:
+		return result_holder[0]
+	# Worker is slow or the batch failed: predict this row directly
+	return float(_model_predict(features)[0])
+
+_feature_buffers = threading.local()
+
+def _feature_row():
+	"""Preallocated 1x4 float32 feature row, one per request thread"""
+	row = getattr(_feature_buffers, "row", None)
+	if row is None:
+		row = _feature_buffers.row = np.empty((1, 4), dtype=np.float32)
+	return row
+
+@functools.lru_cache(maxsize=4096)
+def _cached_predict(hour: int, temp_q: int, occ_q: int, w: int) -> float:
+	"""Memoized model prediction on quantized features (hour, °C, occupancy/5, weekend)"""
+	features = _feature_row()
+	features[0, 0] = hour
+	features[0, 1] = temp_q
+	features[0, 2] = occ_q
+	features[0, 3] = w
+	# Queue a copy: if the wait times out this thread returns (and reuses its
+	# buffer) while the row may still be waiting in the batch queue
+	return batched_predict(features.copy())
+
+def _load_model_file(path):
+	"""Unpickle a model saved by train_real_model.py (plain pickle, protocol 5)"""
+	try:
+		with open(path, "rb") as f:
+			model = pickle.load(f)
+		if hasattr(model, "predict"):
+			return model
+	except Exception:
+		pass
+	# Older artifacts were written with joblib.dump; plain pickle either fails
+	# on them or returns one of joblib's stored arrays instead of the estimator
+	model = joblib.load(path)
+	if not hasattr(model, "predict"):
+		raise TypeError(f"{path} does not contain a model (got {type(model).__name__})")
+	return model
+
+def load_model():
+	"""(Re)load the trained model, trying the real model first, then the synthetic one"""
+	global trained_model, compiled_predictor, model_type, _last_prediction
+	trained_model = None
+	compiled_predictor = None
+	model_type = "rule-based"
+	_cached_predict.cache_clear()
+	_last_prediction = (None, None)
+
+	for model_path, model_name in [(REAL_MODEL_PATH, "real"), (MODEL_PATH, "synthetic")]:
+		if os.path.exists(model_path):
+			try:
+				model = _load_model_file(model_path)
+				# Batches are small; joblib thread dispatch would dominate predict time
+				if hasattr(model, "n_jobs"):
+					model.n_jobs = 1
+				trained_model, model_type = model, model_name
+				print(f"✅ Loaded {model_name} trained model from {model_path}")
+				break
+			except Exception as e:
+				print(f"⚠️  Failed to load {model_name} model: {e}")
+
+	# Use the compiled forest exported by train_real_model.py if it matches the pickle
+	if (model_type == "real" and treelite_runtime is not None and os.path.exists(REAL_MODEL_LIB_PATH)
+			and os.path.getmtime(REAL_MODEL_LIB_PATH) >= os.path.getmtime(REAL_MODEL_PATH)):
+		try:
+			compiled_predictor = treelite_runtime.Predictor(REAL_MODEL_LIB_PATH)
+			print(f"✅ Loaded compiled model from {REAL_MODEL_LIB_PATH}")
+		except Exception as e:
+			print(f"⚠️  Failed to load compiled model, using scikit-learn: {e}")
+
+	if trained_model is None:
+		print(f"⚠️  No trained model found")
+		print(f"   Looking for: {REAL_MODEL_PATH} or {MODEL_PATH}")
+		print(f"   Using rule-based predictor. Run 'python backend/train_real_model.py' or 'python backend/train_model.py'")
+
+load_model()
 
 # ─── Simple rule-based predictor (no ML dependency) ─────────────────────────────
-def rule_based_predict(hour, temperature, occupancy, is_weekend):
+# sin term of the hour-of-day modulation for integer hours 0-23
+_HOUR_SIN = np.array([math.sin(2 * math.pi * (h - 12) / 24) for h in range(24)])
+
+@njit(cache=True)
+def _rule_based_kernel(hour_sin, temperature, occupancy, weekend):
 	# Base load
 	base = 200.0
 	# Temperature contributes positively
-	temp_component = 5.0 * float(temperature)
+	temp_component = 5.0 * temperature
 	# Occupancy contributes positively
-	occ_component = 2.0 * float(occupancy)
+	occ_component = 2.0 * occupancy
 	# Weekend uplift
-	weekend_component = 20.0 * (1 if int(is_weekend) else 0)
+	weekend_component = 20.0 * weekend
 	# Mild hour-of-day modulation (peak around afternoon)
-	hour_component = 10.0 * math.sin(2 * math.pi * (float(hour) - 12.0) / 24.0)
+	hour_component = 10.0 * hour_sin
 	return base + temp_component + occ_component + weekend_component + hour_component
 
+def rule_based_predict(hour, temperature, occupancy, is_weekend):
+	# Coerce here so the JIT kernel always sees plain floats
+	hour = float(hour)
+	if hour.is_integer():
+		hour_sin = _HOUR_SIN[int(hour) % 24]
+	else:
+		hour_sin = math.sin(2 * math.pi * (hour - 12.0) / 24.0)
+	return _rule_based_kernel(hour_sin, float(temperature), float(occupancy),
+	                          1.0 if int(is_weekend) else 0.0)
+
+@njit(parallel=True, cache=True)
+def rule_based_predict_batch(hours, temps, occs, weekends):
+	"""Vectorized rule-based prediction over float64 arrays (weekends as 0/1)"""
+	return (200.0 + 5.0 * temps + 2.0 * occs + 20.0 * weekends
+	        + 10.0 * np.sin(2 * np.pi * (hours - 12.0) / 24.0))
+
+# Compile (or load the cached build) at import, not on the first request
+rule_based_predict(12, 22.0, 0, 0)
+
 # ─── 1) PREDICTION ENDPOINT ─────────────────────────────────────────────────────
-@app.route("/predict", methods=["POST"])
-def predict():
-	data = request.get_json()
-	hour = data["hour"]
-	temperature = data.get("temperature")  # Optional parameter
-	occupancy = data["occupancy"]
-	is_weekend = data["is_weekend"]
-	
+def _resolve_temperature(temperature):
 	# If temperature not provided, get real-time weather data
 	if temperature is None:
-		temperature = get_current_temperature()
+		temperature = float(get_current_temperature())
 		print(f"🌡️  Using real-time temperature: {temperature}°C")
-	else:
-		temperature = float(temperature)
-	
+		return temperature
+	return float(temperature)
+
+def _predict_usage(hour, temperature, occupancy, is_weekend):
+	"""Prediction payload shared by /predict and /tick"""
 	# Use trained model if available, otherwise fall back to rule-based
 	if trained_model is not None:
 		# Prepare features in the same format as training data
 		# Features: [hour, temperature, occupancy, is_weekend_True]
-		is_weekend_true = 1 if int(is_weekend) else 0
-		features = np.array([[hour, temperature, occupancy, is_weekend_true]])
-		pred = trained_model.predict(features)[0]
+		# Quantize so repeated readings hit the prediction cache
+		pred = _cached_predict(
+			int(hour),
+			round(temperature),
+			int(occupancy) // 5 * 5,
+			int(bool(int(is_weekend))),
+		)
 	else:
 		pred = rule_based_predict(hour, temperature, occupancy, is_weekend)
 	
-	return jsonify({
-		"predicted_usage_kW": round(float(pred), 2),
+	return {
+		"predicted_usage_kW": round(pred, 2),
 		"model_type": model_type,
-		"temperature_used": round(float(temperature), 1)
-	})
+		"temperature_used": round(temperature, 1)
+	}
+
+@app.route("/predict", methods=["POST"])
+def predict():
+	global _last_prediction
+	data = request.get_json()
+	hour = data["hour"]
+	temperature = _resolve_temperature(data.get("temperature"))  # Optional parameter
+	occupancy = data["occupancy"]
+	is_weekend = data["is_weekend"]
+	
+	# Repeated dashboard polls for the same reading reuse the last response body.
+	# Exact values: the rule-based fallback is continuous in hour/temperature/occupancy
+	key = (float(hour), temperature, float(occupancy), int(bool(int(is_weekend))))
+	last_key, last_body = _last_prediction
+	if key == last_key:
+		return app.response_class(last_body, mimetype="application/json")
+	
+	response = ojson(_predict_usage(hour, temperature, occupancy, is_weekend))
+	_last_prediction = (key, response.get_data())
+	return response
 
 # ─── 2) IN‐MEMORY SENSOR STATE ───────────────────────────────────────────────────
 sensor_data = {
@@ -90,25 +297,55 @@ sensor_data = {
 	"temperature": None,
 	"timestamp": None
 }
+# Serialized once per update so /current_status never re-encodes
+_sensor_data_bytes = orjson.dumps(sensor_data)
 
 # ─── 3) UPDATE ROUTE (called by sensor_feed.py) ────────────────────────────────
 @app.route("/sensor_update", methods=["POST"])
 def sensor_update():
-	global sensor_data
-	sensor_data = request.get_json()
-	return jsonify({"status": "ok"}), 200
+	global sensor_data, _sensor_data_bytes
+	data = request.get_json()
+	# Each global is replaced by a single rebind, so readers never see partial state
+	_sensor_data_bytes = orjson.dumps(data)
+	sensor_data = data
+	return ojson({"status": "ok"})
 
-# ─── 4) READ ROUTE (called by streamlit_app.py) ────────────────────────────────
+# ─── 4) READ ROUTE ─────────────────────────────────────────────────────────────
 @app.route("/current_status", methods=["GET"])
 def current_status():
-	return jsonify(sensor_data), 200
+	return Response(_sensor_data_bytes, mimetype="application/json"), 200
+
+# ─── 4b) COMBINED TICK ROUTE (called by streamlit_app.py) ─────────────────────
+@app.route("/tick", methods=["POST"])
+def tick():
+	"""Current sensor state plus a prediction in one round-trip.
+	
+	Pass "occupancy" to predict for it directly, or "profile_occupancy" and
+	"occ_blend" to blend the live sensor occupancy with a time-of-day profile.
+	"""
+	data = request.get_json()
+	status = sensor_data
+	hour = data["hour"]
+	temperature = _resolve_temperature(data.get("temperature"))
+	is_weekend = data["is_weekend"]
+	occupancy = data.get("occupancy")
+	if occupancy is None:
+		occ_blend = float(data.get("occ_blend", 0.0))
+		sensor_occ = int(status.get("occupancy") or 0)
+		occupancy = int((1 - occ_blend) * sensor_occ + occ_blend * int(data.get("profile_occupancy", 0)))
+	
+	return ojson({
+		"status": status,
+		"occupancy": occupancy,
+		"prediction": _predict_usage(hour, temperature, occupancy, is_weekend),
+	})
 
 # ─── 5) WEATHER ROUTE ────────────────────────────────────────────────────────────
 @app.route("/weather", methods=["GET"])
 def get_weather():
 	"""Get current weather information"""
 	weather_info = get_weather_info()
-	return jsonify(weather_info), 200
+	return ojson(weather_info)
 
 # ─── 5b) SET WEATHER CITY ROUTE ──────────────────────────────────────────────────
 @app.route("/set_city", methods=["POST"])
@@ -117,10 +354,10 @@ def set_city():
 	data = request.get_json() or {}
 	city = (data.get("city") or "").strip()
 	if not city:
-		return jsonify({"error": "city is required"}), 400
+		return ojson({"error": "city is required"}, 400)
 	weather_service.city = city
 	print(f"🌍 Weather city updated to: {city}")
-	return jsonify({"status": "ok", "city": city}), 200
+	return ojson({"status": "ok", "city": city})
 
 # ─── 6) MAIN LAUNCH ────────────────────────────────────────────────────────────
 if __name__ == "__main__":
@@ -130,4 +367,4 @@ if __name__ == "__main__":
 		methods = ",".join(sorted(rule.methods - {"HEAD","OPTIONS"}))
 		print(f"  {methods:10}  {rule}")
 	print()
-	app.run(host="127.0.0.1", port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+	app.run(host="127.0.0.1", port=5000, use_reloader=False)
\ No newline at end of file
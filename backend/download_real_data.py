@@ -6,109 +6,138 @@ Download and prepare real commercial building energy data
 
 import pandas as pd
 import numpy as np
+import numexpr as ne
 from sklearn.model_selection import train_test_split
 import requests
 import os
 
-def download_sample_data():
+PARQUET_PATH = "real_walmart_energy.parquet"
+CSV_PATH = "real_walmart_energy.csv"
+
+def download_sample_data(write_csv=True):
     """
     Download a sample of real building energy data
     Using a simulated but realistic dataset for demonstration
+    
+    Saves typed Parquet for training; write_csv also keeps the CSV copy
+    read by the Streamlit dashboard (and used if pyarrow is unavailable).
     """
     print("Generating realistic Walmart store energy data...")
     
     # Create realistic data based on typical Walmart store patterns
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Generate 3 months of hourly data (90 days * 24 hours = 2160 rows)
-    hours = np.arange(24 * 90)
-    df = pd.DataFrame({
-        'timestamp': pd.date_range('2024-01-01', periods=2160, freq='H')
-    })
-    
-    # Extract time features
-    df['hour'] = df['timestamp'].dt.hour
-    df['day_of_week'] = df['timestamp'].dt.dayofweek
-    df['is_weekend'] = df['day_of_week'] >= 5
+    # Time features come straight from the row index; 2024-01-01 is a Monday
+    n = 24 * 90
+    idx = np.arange(n)
+    hour = (idx % 24).astype(np.int8)
+    day_of_week = ((idx // 24) % 7).astype(np.int8)
+    day_of_year = (idx // 24 + 1).astype(np.int16)
+    is_weekend = day_of_week >= 5
+    
+    # Float columns are written in place into one column-major buffer;
+    # `scratch` is reused for every noise draw and table lookup
+    out = np.empty((n, 3), order='F')
+    temperature, occupancy, energy = out[:, 0], out[:, 1], out[:, 2]
+    scratch = np.empty(n)
     
     # Realistic temperature pattern (winter to spring)
-    day_of_year = df['timestamp'].dt.dayofyear
-    base_temp = 40 + 30 * np.sin(2 * np.pi * (day_of_year - 80) / 365)  # Winter to spring
-    daily_variation = 15 * np.sin(2 * np.pi * df['hour'] / 24)
-    df['temperature'] = base_temp + daily_variation + np.random.normal(0, 3, len(df))
+    np.subtract(day_of_year, 80, out=temperature)
+    np.multiply(2 * np.pi, temperature, out=temperature)
+    np.divide(temperature, 365, out=temperature)
+    np.sin(temperature, out=temperature)
+    np.multiply(30, temperature, out=temperature)
+    np.add(40, temperature, out=temperature)  # Winter to spring
+    daily_variation = 15 * np.sin(2 * np.pi * np.arange(24) / 24)
+    np.add(temperature, np.take(daily_variation, hour, out=scratch), out=temperature)
+    rng.standard_normal(out=scratch)
+    np.add(temperature, np.multiply(scratch, 3, out=scratch), out=temperature)
     
     # Realistic occupancy pattern for Walmart
     # Store hours: 6 AM - 11 PM, peaks at 10 AM, 2 PM, 7 PM
-    store_open = (df['hour'] >= 6) & (df['hour'] <= 23)
+    store_open = (hour >= 6) & (hour <= 23)
     
-    occupancy = np.zeros(len(df))
+    # Hour-of-day occupancy lookup table, evaluated once for hours 0-23
+    hour_lut = np.zeros(24)
     # Morning peak (8-11 AM)
-    morning_mask = (df['hour'] >= 8) & (df['hour'] <= 11)
-    occupancy[morning_mask] = 150 + 50 * np.sin(np.pi * (df['hour'][morning_mask] - 8) / 3)
-    
+    hour_lut[8:12] = 150 + 50 * np.sin(np.pi * (np.arange(8, 12) - 8) / 3)
     # Afternoon peak (1-4 PM)
-    afternoon_mask = (df['hour'] >= 13) & (df['hour'] <= 16)
-    occupancy[afternoon_mask] = 120 + 40 * np.sin(np.pi * (df['hour'][afternoon_mask] - 13) / 3)
-    
+    hour_lut[13:17] = 120 + 40 * np.sin(np.pi * (np.arange(13, 17) - 13) / 3)
     # Evening peak (6-9 PM)
-    evening_mask = (df['hour'] >= 18) & (df['hour'] <= 21)
-    occupancy[evening_mask] = 180 + 60 * np.sin(np.pi * (df['hour'][evening_mask] - 18) / 3)
-    
-    # Add noise and ensure non-negative
-    df['occupancy'] = np.maximum(0, occupancy + np.random.normal(0, 15, len(df)))
-    df.loc[~store_open, 'occupancy'] = 0
-    
-    # Realistic energy consumption pattern
-    # Base load (HVAC, lighting, refrigeration)
-    base_load = 250  # kW baseline for large Walmart store
-    
-    # HVAC component (temperature dependent)
-    hvac_load = np.where(df['temperature'] < 45,  # Heating
-                       (45 - df['temperature']) * 8,
-                       np.where(df['temperature'] > 75,  # Cooling
-                               (df['temperature'] - 75) * 12,
-                               0))
-    
-    # Lighting component (time dependent)
-    lighting_load = np.where((df['hour'] >= 6) & (df['hour'] <= 23), 80, 20)
-    
-    # Occupancy component
-    occupancy_load = df['occupancy'] * 1.5
-    
-    # Weekend uplift (more shoppers)
-    weekend_load = np.where(df['is_weekend'], 50, 0)
-    
-    # Total energy with realistic noise
-    df['energy_kW'] = (base_load + hvac_load + lighting_load + 
-                      occupancy_load + weekend_load + 
-                      np.random.normal(0, 20, len(df)))
+    hour_lut[18:22] = 180 + 60 * np.sin(np.pi * (np.arange(18, 22) - 18) / 3)
+    np.take(hour_lut, hour, out=occupancy)
+    
+    # Add noise, ensure non-negative and zero outside store hours
+    rng.standard_normal(out=scratch)
+    np.add(occupancy, np.multiply(scratch, 15, out=scratch), out=occupancy)
+    np.maximum(occupancy, 0, out=occupancy)
+    np.copyto(occupancy, 0, where=~store_open)
+    
+    # Realistic energy consumption pattern, evaluated as one fused expression
+    rng.standard_normal(out=scratch)
+    noise = np.multiply(scratch, 20, out=scratch)
+    ne.evaluate(
+        # Base load (HVAC, lighting, refrigeration) for large Walmart store
+        "250"
+        # HVAC component: heating below 45°F, cooling above 75°F
+        " + where(temperature < 45, (45 - temperature) * 8,"
+        "        where(temperature > 75, (temperature - 75) * 12, 0))"
+        # Lighting component (store hours vs. closed)
+        " + where((hour >= 6) & (hour <= 23), 80, 20)"
+        # Occupancy component
+        " + occupancy * 1.5"
+        # Weekend uplift (more shoppers)
+        " + where(is_weekend, 50, 0)"
+        # Realistic noise
+        " + noise",
+        out=energy,
+    )
     
     # Ensure reasonable bounds
-    df['energy_kW'] = np.clip(df['energy_kW'], 200, 800)
-    
-    # Select relevant columns
-    df = df[['timestamp', 'hour', 'temperature', 'occupancy', 'is_weekend', 'energy_kW']]
+    np.clip(energy, 200, 800, out=energy)
     
-    # Save to CSV
-    output_path = "real_walmart_energy.csv"
-    df.to_csv(output_path, index=False)
-    print(f"✅ Realistic energy data saved to {output_path}")
+    df = pd.DataFrame({
+        'timestamp': np.datetime64('2024-01-01T00', 'h') + idx.astype('timedelta64[h]'),
+        'hour': hour,
+        'temperature': temperature,
+        'occupancy': occupancy,
+        'is_weekend': is_weekend,
+        'energy_kW': energy,
+    }, copy=False)  # wrap the buffer's columns rather than copying them
+    
+    # Save to Parquet (typed columns, no re-parsing on load)
+    output_path = PARQUET_PATH
+    try:
+        df.to_parquet(output_path, index=False)
+        print(f"✅ Realistic energy data saved to {output_path}")
+    except ImportError as e:
+        print(f"⚠️  Parquet unavailable ({e}), falling back to CSV")
+        output_path = CSV_PATH
+        write_csv = True
+    
+    if write_csv:
+        df.to_csv(CSV_PATH, index=False)
+        print(f"✅ Realistic energy data saved to {CSV_PATH}")
     print(f"   Shape: {df.shape}")
     print(f"   Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
     print(f"   Energy range: {df['energy_kW'].min():.1f} - {df['energy_kW'].max():.1f} kW")
     
     return output_path
 
-def prepare_real_data(csv_path):
+def prepare_real_data(data_path):
     """
-    Prepare real data for training
+    Prepare real data for training (Parquet or CSV)
     """
-    print(f"\nPreparing data from {csv_path}...")
-    
-    df = pd.read_csv(csv_path)
+    print(f"\nPreparing data from {data_path}...")
     
-    # Convert timestamp to datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    if data_path.endswith(".parquet"):
+        # Columns are already typed, timestamp included
+        df = pd.read_parquet(data_path)
+    else:
+        df = pd.read_csv(data_path)
+        # Convert timestamp to datetime
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
     
     # Feature engineering
     df['is_weekend'] = df['is_weekend'].astype(int)
@@ -117,8 +146,10 @@ def prepare_real_data(csv_path):
     features = ['hour', 'temperature', 'occupancy', 'is_weekend']
     target = 'energy_kW'
     
-    X = df[features]
-    y = df[target]
+    # Contiguous float32 matrix: the dtype the tree code uses internally,
+    # so fit/predict skip DataFrame validation and conversion copies
+    X = np.ascontiguousarray(df[features].to_numpy(dtype=np.float32))
+    y = df[target].to_numpy()
     
     # Train/test split
     X_train, X_test, y_train, y_test = train_test_split(
@@ -133,10 +164,10 @@ def prepare_real_data(csv_path):
 
 if __name__ == "__main__":
     # Download/generate realistic data
-    csv_path = download_sample_data()
+    data_path = download_sample_data()
     
     # Prepare for training
-    X_train, X_test, y_train, y_test = prepare_real_data(csv_path)
+    X_train, X_test, y_train, y_test = prepare_real_data(data_path)
     
     print("\nData ready for training!")
     print("Run: python backend/train_real_model.py")
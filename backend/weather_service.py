@@ -6,6 +6,7 @@ Weather service for real-time temperature data
 
 import requests
 import os
+import threading
 import time
 from datetime import datetime, timezone
 from typing import Optional, Dict
@@ -16,50 +17,106 @@ class WeatherService:
         self.city = city
         self.base_url = "https://api.openweathermap.org/data/2.5/weather"
         self.cache_timeout = 300  # 5 minutes
+        self.max_backoff = 3600  # 60 minutes
         self._last_fetch = 0
-        self._cached_data = None
+        self._cached_data = None  # Full JSON of the last good response
+        self._cached_city = None
+        self._last_modified = None
+        self._last_error = None
+        self._error_city = None  # City _last_error belongs to
+        self._backoff = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher_pid = None
+        self._target_city = None  # City the refresh thread is fetching
+        self._session = requests.Session()
     
-    def get_current_temperature(self) -> float:
-        """Get current temperature in Celsius"""
-        if not self.api_key:
-            print("⚠️  No OWM_API_KEY found, using default temperature (22°C)")
-            return 22.0
-        
-        current_time = time.time()
-        
-        # Use cached data if still valid
-        if self._cached_data and (current_time - self._last_fetch) < self.cache_timeout:
-            return self._cached_data
+    def _refresh(self):
+        """Fetch the OpenWeatherMap response and update the shared cache.
         
+        Runs on the refresh thread only. On failure the last good response
+        stays cached and the next attempt backs off exponentially.
+        """
+        city = self._target_city = self.city
         try:
             params = {
-                "q": self.city,
+                "q": city,
                 "appid": self.api_key,
                 "units": "metric"  # Get temperature in Celsius
             }
+            headers = {}
+            if self._cached_city == city and self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
             
-            response = requests.get(self.base_url, params=params, timeout=5)
+            response = self._session.get(self.base_url, params=params, headers=headers, timeout=5)
+            if response.status_code == 304 and self._cached_city == city:
+                self._last_fetch = time.time()
+                self._backoff = 0
+                return
             response.raise_for_status()
             
             data = response.json()
+            if "main" not in data or "temp" not in data["main"]:
+                raise ValueError("Invalid weather API response format")
+            
+            with self._lock:
+                self._cached_data = data
+                self._cached_city = city
+                self._last_modified = response.headers.get("Last-Modified")
+                self._last_fetch = time.time()
+            self._last_error = None
+            self._backoff = 0
+            
+            print(f"🌡️  Current temperature in {city}: {data['main']['temp']:.1f}°C")
             
-            if "main" in data and "temp" in data["main"]:
-                temp_celsius = data["main"]["temp"]
-                self._cached_data = temp_celsius
-                self._last_fetch = current_time
-                
-                print(f"🌡️  Current temperature in {self.city}: {temp_celsius:.1f}°C")
-                return temp_celsius
-            else:
-                print("⚠️  Invalid weather API response format")
-                return 22.0
-                
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️  Weather API error: {e}")
-            return 22.0
         except Exception as e:
-            print(f"⚠️  Unexpected weather error: {e}")
+            self._last_error = str(e)
+            self._error_city = city
+            self._backoff = min(max(self._backoff * 2, 60), self.max_backoff)
+            print(f"⚠️  Weather API error: {e} (retrying in {self._backoff}s)")
+    
+    def _refresh_loop(self):
+        while True:
+            self._refresh()
+            # Sleep until the cache goes stale, or until woken by a city change
+            self._wake.wait(timeout=self._backoff or self.cache_timeout)
+            self._wake.clear()
+    
+    def _ensure_refresher(self):
+        # Started lazily, once per process, so forked server workers get their own
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid != os.getpid():
+                self._refresher_pid = os.getpid()
+                self._target_city = self.city
+                threading.Thread(target=self._refresh_loop, daemon=True).start()
+    
+    def _fetch(self) -> Optional[Dict]:
+        """Get the cached OpenWeatherMap response for the current city.
+        
+        Never blocks on the network: returns None until the refresh thread
+        has fetched data for this city.
+        """
+        self._ensure_refresher()
+        with self._lock:
+            data, city = self._cached_data, self._cached_city
+        if city != self.city:
+            if self._target_city != self.city:
+                self._wake.set()
+            return None
+        return data
+    
+    def get_current_temperature(self) -> float:
+        """Get current temperature in Celsius"""
+        if not self.api_key:
+            print("⚠️  No OWM_API_KEY found, using default temperature (22°C)")
+            return 22.0
+        
+        data = self._fetch()
+        if data is None:
             return 22.0
+        return data["main"]["temp"]
     
     def get_weather_info(self) -> Dict:
         """Get full weather information"""
@@ -71,34 +128,26 @@ class WeatherService:
                 "error": "No API key"
             }
         
-        try:
-            params = {
-                "q": self.city,
-                "appid": self.api_key,
-                "units": "metric"
-            }
-            
-            response = requests.get(self.base_url, params=params, timeout=5)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            return {
-                "temperature": data["main"]["temp"],
-                "description": data["weather"][0]["description"].title(),
-                "city": data.get("name", self.city),
-                "humidity": data["main"].get("humidity", 0),
-                "feels_like": data["main"].get("feels_like", data["main"]["temp"]),
-                "error": None
-            }
-            
-        except Exception as e:
+        data = self._fetch()
+        if data is None:
             return {
                 "temperature": 22.0,
                 "description": "Unknown",
                 "city": self.city,
-                "error": str(e)
+                # Don't report a previous city's failure for the newly selected one
+                "error": (self._last_error if self._error_city == self.city else None)
+                         or "Weather data not loaded yet"
             }
+        
+        weather = data.get("weather") or [{}]
+        return {
+            "temperature": data["main"]["temp"],
+            "description": weather[0].get("description", "Unknown").title(),
+            "city": data.get("name", self.city),
+            "humidity": data["main"].get("humidity", 0),
+            "feels_like": data["main"].get("feels_like", data["main"]["temp"]),
+            "error": None
+        }
 
 # Global weather service instance
 weather_service = WeatherService()
@@ -115,6 +164,10 @@ if __name__ == "__main__":
     # Test the weather service
     print("Testing weather service...")
     
+    # Fetch synchronously once; normally the background thread does this
+    if weather_service.api_key:
+        weather_service._refresh()
+    
     temp = get_current_temperature()
     print(f"Current temperature: {temp}°C")
     
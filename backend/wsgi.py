@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI entry point for production serving
+
+Run from the project root:
+    gunicorn -w 1 --threads 8 --preload --chdir backend -b 127.0.0.1:5000 wsgi:app
+
+Keep a single worker: the live sensor reading and the weather city are held
+in process memory, so separate worker processes would each see their own copy.
+Threads give request concurrency (prediction batching relies on it), and
+--preload loads the model before the worker is forked.
+"""
+
+from app import app
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=5000)
@@ -8,6 +8,7 @@ Created on Wed Jul  9 12:12:23 2025
 
 # sensor_feed.py
 import time, random, requests
+from requests.adapters import HTTPAdapter
 import sys
 import os
 import datetime
@@ -15,14 +16,32 @@ import datetime
 # Add backend to path to import weather service
 sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 
-API = "http://127.0.0.1:5000"
+# e.g. "http+unix://%2Ftmp%2Fwalmart.sock" for a gunicorn unix socket (needs requests-unixsocket)
+API = os.getenv("BACKEND_URL", "http://127.0.0.1:5000")
+
+# Reuse keep-alive connections to the backend across ticks
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2))
+if API.startswith("http+unix://"):
+    import requests_unixsocket
+    session.mount("http+unix://", requests_unixsocket.UnixAdapter(pool_connections=2, pool_maxsize=2))
+
+# Dedicated generator for the simulated readings
+rng = random.Random()
+
+# (base, jitter) occupancy per hour of day for Walmart
+OCCUPANCY_TABLE = [(0, 0)] * 24        # Closed
+OCCUPANCY_TABLE[6:24] = [(60, 20)] * 18  # Regular store hours
+OCCUPANCY_TABLE[8:12] = [(120, 30)] * 4  # Morning peak
+OCCUPANCY_TABLE[13:17] = [(100, 25)] * 4 # Afternoon peak
+OCCUPANCY_TABLE[18:22] = [(160, 40)] * 4 # Evening peak
 
 def get_backend_temperature() -> float:
 	"""Fetch current temperature from the backend /weather endpoint.
 	This ensures the sensor feed uses the same city as configured by the dashboard.
 	"""
 	try:
-		resp = requests.get(f"{API}/weather", timeout=2)
+		resp = session.get(f"{API}/weather", timeout=2)
 		resp.raise_for_status()
 		data = resp.json()
 		return float(data.get("temperature", 22.0))
@@ -37,20 +56,12 @@ while True:
     current_temp = get_backend_temperature()
     
     # Generate realistic occupancy based on time and temperature
-    current_hour = datetime.datetime.now().hour
+    now = datetime.datetime.now()
+    current_hour = now.hour
     
     # Base occupancy patterns for Walmart
-    if 6 <= current_hour <= 23:  # Store hours
-        if 8 <= current_hour <= 11:  # Morning peak
-            base_occupancy = 120 + random.randint(-30, 30)
-        elif 13 <= current_hour <= 16:  # Afternoon peak
-            base_occupancy = 100 + random.randint(-25, 25)
-        elif 18 <= current_hour <= 21:  # Evening peak
-            base_occupancy = 160 + random.randint(-40, 40)
-        else:  # Regular hours
-            base_occupancy = 60 + random.randint(-20, 20)
-    else:  # Closed
-        base_occupancy = 0
+    base, jitter = OCCUPANCY_TABLE[current_hour]
+    base_occupancy = base + rng.randint(-jitter, jitter) if base else 0
     
     # Temperature affects occupancy (extreme weather reduces foot traffic)
     if current_temp < 5 or current_temp > 35:
@@ -60,7 +71,7 @@ while True:
     else:
         occupancy_factor = 1.0
     
-    occupancy = max(0, int(base_occupancy * occupancy_factor + random.randint(-10, 10)))
+    occupancy = max(0, int(base_occupancy * occupancy_factor + rng.randint(-10, 10)))
     
     # Power draw correlates with occupancy and temperature (HVAC load)
     base_power = 250  # Base load for large store
@@ -73,18 +84,18 @@ while True:
     occupancy_power = occupancy * 1.2
     
     # Total power with some randomness
-    power_kW = round(base_power + hvac_power + occupancy_power + random.randint(-20, 20), 2)
+    power_kW = round(base_power + hvac_power + occupancy_power + rng.randint(-20, 20), 2)
     power_kW = max(200, min(800, power_kW))  # Keep within realistic bounds
     
     data = {
         "occupancy": occupancy,
         "power_kW": power_kW,
         "temperature": round(current_temp, 1),
-        "timestamp": datetime.datetime.now().isoformat()
+        "timestamp": now.isoformat()
     }
     
     try:
-       resp = requests.post(f"{API}/sensor_update", json=data, timeout=2)
+       resp = session.post(f"{API}/sensor_update", json=data, timeout=2)
        print(f"→ sensor_update: {resp.status_code} - Occupancy: {occupancy}, Power: {power_kW}kW, Temp: {current_temp:.1f}°C")
     except Exception as e:
         print(f"Error: {e}")
@@ -6,15 +6,33 @@ Auto-adjusts AC & lighting based on occupancy, real-time weather & live sensor f
 """
 
 import streamlit as st
-from streamlit_autorefresh import st_autorefresh
+import pandas as pd
+import altair as alt
 import requests
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
+import time
 import os
 import math
 import csv
+import numpy as np
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
+_IST = ZoneInfo("Asia/Kolkata")
+# (label, hex) accent colors, indexed by the sidebar selectbox position
+ACCENTS = (("Teal", "#14b8a6"), ("Blue", "#3b82f6"), ("Green", "#22c55e"), ("Orange", "#f59e0b"))
+
+# Backend base URL. Use e.g. "http+unix://%2Ftmp%2Fwalmart.sock" when gunicorn
+# binds unix:/tmp/walmart.sock to skip the TCP loopback stack (needs requests-unixsocket)
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:5000")
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_OWM_HEADERS = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+LIVE_REFRESH_S = 5     # live section timer (st.fragment run_every)
+_POLL_JITTER_S = 0.5   # timer ticks drift; don't let that skip a due poll
+
 # ─── 1) PAGE CONFIG ─────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="Walmart Project",
@@ -23,8 +41,11 @@ st.set_page_config(
 )
 
 # ─── 0) REMOVE TOP BLANK ─────────────────────────────────────────────────────────
-st.markdown(
-    """
+# CSS strings are built once and cached; they must still be emitted on every
+# rerun, since Streamlit drops elements a rerun doesn't render
+@st.cache_data(show_spinner=False)
+def _base_css() -> str:
+    return """
     <style>
       /* remove that big top‐margin above the first header */
       .block-container {
@@ -34,16 +55,15 @@ st.markdown(
       .metric-label { color: #9aa4b2; font-size: 12px; }
       .metric-value { font-size: 22px; font-weight: 700; }
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+    """
 
-# ─── 2) AUTO-REFRESH EVERY 5s ────────────────────────────────────────────────────
-st_autorefresh(interval=5_000, limit=None, key="sensor_refresh")
+st.markdown(_base_css(), unsafe_allow_html=True)
 
 # ─── 3) WEATHER API KEY ──────────────────────────────────────────────────────────
-# Read key each call: prefer env var, else st.secrets if available
-
+# Prefer env var, else st.secrets if available. Resolved once per process
+# (a module-level lru_cache would be rebuilt on every rerun); the Refresh
+# weather button clears it.
+@st.cache_resource(show_spinner=False)
 def _get_owm_api_key() -> str | None:
     key = os.getenv("OWM_API_KEY")
     if key:
@@ -57,31 +77,23 @@ def _get_owm_api_key() -> str | None:
 with st.sidebar:
     st.markdown("### Appearance")
     theme = st.radio("Theme", ["Dark", "Light"], index=0, horizontal=True)
-    accent = st.selectbox("Accent color", ["Teal", "Blue", "Green", "Orange"], index=0)
+    accent_idx = st.selectbox("Accent color", range(len(ACCENTS)), index=0,
+                              format_func=lambda i: ACCENTS[i][0])
 
-accent_map = {
-    "Teal": "#14b8a6",
-    "Blue": "#3b82f6",
-    "Green": "#22c55e",
-    "Orange": "#f59e0b",
-}
-accent_hex = accent_map.get(accent, "#14b8a6")
+accent_hex = ACCENTS[accent_idx][1]
 
-if theme == "Dark":
-    st.markdown(
-        f"""
+@st.cache_data(show_spinner=False)
+def _theme_css(theme: str, accent_hex: str) -> str:
+    if theme == "Dark":
+        return f"""
         <style>
           body, .stApp {{ background: #0b1220; color: #e6edf6; }}
           .metric-card {{ border-color: rgba(255,255,255,0.12); }}
           a, .st-emotion-cache-16idsys a {{ color: {accent_hex}; }}
           .stButton>button {{ background:{accent_hex}; color:white; border:none; }}
         </style>
-        """,
-        unsafe_allow_html=True,
-    )
-else:
-    st.markdown(
-        f"""
+        """
+    return f"""
         <style>
           /* Light theme: enforce high-contrast readable text */
           body, .stApp {{ background: #ffffff; color: #0b1220; }}
@@ -99,12 +111,34 @@ else:
           a, .st-emotion-cache-16idsys a {{ color: {accent_hex} !important; }}
           .stButton>button {{ background:{accent_hex}; color:white; border:none; }}
         </style>
-        """,
-        unsafe_allow_html=True,
-    )
+        """
+
+st.markdown(_theme_css(theme, accent_hex), unsafe_allow_html=True)
+
+# ─── HTTP SESSION ───────────────────────────────────────────────────────────────
+@st.cache_resource
+def _http() -> requests.Session:
+    """Keep-alive session shared by all reruns (no new TCP/TLS handshake per call)"""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.1, status_forcelist=(502, 503, 504),
+                  allowed_methods=frozenset({"GET"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # No retries for OpenWeather: a failed call falls back to the last good
+    # reading (see get_weather) instead of stalling the rerun
+    session.mount("https://api.openweathermap.org", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    if BACKEND_URL.startswith("http+unix://"):
+        import requests_unixsocket
+        session.mount("http+unix://", requests_unixsocket.UnixAdapter(pool_connections=4, pool_maxsize=8))
+    return session
 
 # ─── 4) FETCH REAL-TIME WEATHER ─────────────────────────────────────────────────
-@st.cache_data(ttl=60)
+# OpenWeather updates every ~10–60 min; network errors, 5xx and 429 raise so
+# they are not cached, while 4xx (bad key/city) errors are
+WEATHER_RETRY_S = 60  # after a failed call, wait this long before trying again
+
+@st.cache_data(ttl=600, show_spinner=False)
 def fetch_weather(city_or_coords: str, nonce: int) -> dict:
     api_key = _get_owm_api_key()
     if not api_key:
@@ -127,9 +161,20 @@ def fetch_weather(city_or_coords: str, nonce: int) -> dict:
     else:
         params = {"q": city_or_coords, "appid": api_key, "units": "metric"}
 
-    r = requests.get(base, params=params)
-    d = r.json()
-    if r.status_code != 200 or "main" not in d or "weather" not in d:
+    # (connect, read) timeouts so a stalled DNS/API can't stall every rerun
+    r = _http().get(base, params=params, headers=_OWM_HEADERS, timeout=(2, 3))
+    if r.status_code >= 500 or r.status_code == 429:
+        r.raise_for_status()  # transient: don't cache
+    try:
+        r.raise_for_status()
+    except requests.HTTPError as e:
+        # OpenWeather explains 401/404s in a JSON "message" field
+        try:
+            return {"error": True, "msg": orjson.loads(r.content).get("message") or str(e)}
+        except orjson.JSONDecodeError:
+            return {"error": True, "msg": str(e)}
+    d = orjson.loads(r.content)
+    if "main" not in d or "weather" not in d:
         return {"error": True, "msg": d.get("message", "Unknown error")}
     return {
         "error": False,
@@ -139,18 +184,30 @@ def fetch_weather(city_or_coords: str, nonce: int) -> dict:
         "city" : d.get("name") or city_or_coords,
     }
 
-# ─── 5) FETCH LIVE SENSOR STATUS ────────────────────────────────────────────────
-@st.cache_data(ttl=5)
-def fetch_sensor() -> dict:
-    try:
-        resp = requests.get("http://127.0.0.1:5000/current_status", timeout=1)
-        resp.raise_for_status()
-        data = resp.json()
-        power = float(data.get("power_kW") or 0.0)
-        occ   = int(data.get("occupancy") or 0)
-        return {"occupancy": occ, "power_kW": power}
-    except Exception:
-        return {"occupancy": 0, "power_kW": 0.0}
+def get_weather(city_or_coords: str, nonce: int) -> dict:
+    """Cached weather; if the API is slow or down, reuse the last good reading.
+
+    A failed call isn't cached, so it is remembered here and not retried for
+    WEATHER_RETRY_S (the Refresh button's nonce bump retries immediately).
+    """
+    failed = st.session_state.get("weather_failed")
+    if (failed and failed[:2] == (city_or_coords, nonce)
+            and time.monotonic() - failed[2] < WEATHER_RETRY_S):
+        weather = {"error": True, "msg": failed[3]}
+    else:
+        try:
+            weather = fetch_weather(city_or_coords, nonce)
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            weather = {"error": True, "msg": str(e)}
+            st.session_state["weather_failed"] = (city_or_coords, nonce, time.monotonic(), str(e))
+    if not weather.get("error"):
+        st.session_state["weather_last_good"] = (city_or_coords, weather)
+        return weather
+    last_query, last_good = st.session_state.get("weather_last_good", (None, None))
+    return last_good if last_query == city_or_coords else weather
+
+# Single IST time reference for the whole rerun
+NOW_IST = datetime.datetime.now(_IST)
 
 # ─── SIDEBAR CONTROLS ───────────────────────────────────────────────────────────
 with st.sidebar:
@@ -160,19 +217,23 @@ with st.sidebar:
     city_input = st.text_input("City or 'Lat-Lon'", "Darbhanga")
     if st.button("Refresh weather", type="secondary"):
         st.session_state.weather_nonce += 1
-        # Clear local weather cache
+        # Clear local weather cache and re-read the API key
         fetch_weather.clear()
-        # Inform backend so sensor_feed uses the same city
-        try:
-            requests.post(
-                "http://127.0.0.1:5000/set_city",
-                json={"city": city_input},
-                timeout=2,
-            )
-        except Exception:
-            # Fail silently; dashboard will still use direct API
-            pass
-    weather = fetch_weather(city_input, st.session_state.weather_nonce)
+        _get_owm_api_key.clear()
+        # Inform backend so sensor_feed uses the same city (only when it changed)
+        if city_input != st.session_state.get("last_city"):
+            try:
+                _http().post(
+                    f"{BACKEND_URL}/set_city",
+                    data=orjson.dumps({"city": city_input}),
+                    headers=_JSON_HEADERS,
+                    timeout=2,
+                )
+                st.session_state["last_city"] = city_input
+            except Exception:
+                # Fail silently; dashboard will still use direct API
+                pass
+    weather = get_weather(city_input, st.session_state.weather_nonce)
     if weather.get("error"):
         msg = weather.get("msg", "Weather fetch failed")
         st.warning(f"Weather unavailable: {msg}. Using defaults.")
@@ -192,16 +253,14 @@ with st.sidebar:
 
     st.markdown("---")
     st.markdown("###  Live Sensor Feed")
-    sensor        = fetch_sensor()
-    occupancy_raw = sensor["occupancy"]
-    current_usage = sensor["power_kW"]
+    POLL_S = st.slider("Backend poll interval (s)", LIVE_REFRESH_S, 60, value=2 * LIVE_REFRESH_S,
+                       help="Minimum time between backend reads; raise it if the backend is slow")
 
     # Time awareness controls
     st.markdown("###  Time (IST)")
-    now_ist = datetime.datetime.now(ZoneInfo("Asia/Kolkata"))
-    st.caption(f"Current IST: {now_ist.strftime('%Y-%m-%d %H:%M')} (UTC+5:30)")
+    st.caption(f"Current IST: {NOW_IST.strftime('%Y-%m-%d %H:%M')} (UTC+5:30)")
     use_custom_time = st.checkbox("Use custom time of day", value=False)
-    custom_hour = st.slider("Hour of day (IST)", 0, 23, value=now_ist.hour, disabled=not use_custom_time)
+    custom_hour = st.slider("Hour of day (IST)", 0, 23, value=NOW_IST.hour, disabled=not use_custom_time)
 
     st.markdown("###  Time-aware occupancy")
     occ_blend = st.slider("Blend with IST profile", 0.0, 1.0, value=0.4, help="0 uses sensor only, 1 uses profile only")
@@ -210,9 +269,6 @@ with st.sidebar:
     cost_per_kwh = st.number_input("Cost per kWh (₹)", 0.1, 20.0, 7.0)
     num_stores   = st.slider("No. of identical stores", 1, 50, 1)
 
-    st.write(f"**Sensor occupancy:** {occupancy_raw} people")
-    st.write(f"**Power draw:** {current_usage:.1f} kW")
-
 # Safety defaults in case of rerun ordering
 if 'cost_per_kwh' not in locals():
     cost_per_kwh = 7.0
@@ -220,127 +276,191 @@ if 'num_stores' not in locals():
     num_stores = 1
 
 # ─── 7) TIME, OCCUPANCY PROFILE & FEATURES ──────────────────────────────────────
-# Use IST hour (or custom) to better reflect India operations
-hour_source = custom_hour if use_custom_time else datetime.datetime.now(ZoneInfo("Asia/Kolkata")).hour
-now         = datetime.datetime.now(ZoneInfo("Asia/Kolkata"))
-hour        = int(hour_source)
-
 def occupancy_profile_0_1(hour_local: int, weekend: bool) -> float:
     # Peak during 11:00–19:00, low overnight; weekend slightly lower
     base = 0.15 + 0.55 * max(0.0, math.sin((hour_local - 8) / 24 * math.pi))  # 0.15..0.70
     weekend_factor = 0.85 if weekend else 1.0
     return max(0.05, min(0.95, base * weekend_factor))
 
-temperature = weather["temp"]
+# Full profile domain precomputed once per process (module scope reruns every
+# rerun): rows = (weekday, weekend), columns = hour 0–23
+@st.cache_resource(show_spinner=False)
+def _occ_table() -> np.ndarray:
+    table = np.array([[occupancy_profile_0_1(h, w) for h in range(24)] for w in (False, True)])
+    table.setflags(write=False)  # shared across sessions
+    return table
+
 max_occ     = 200
 ideal_temp  = 22.0
 
-# Determine weekend from IST date
-is_weekend = now.weekday() >= 5
-profile_occ = int(occupancy_profile_0_1(hour, is_weekend) * max_occ)
-occupancy   = int((1 - occ_blend) * occupancy_raw + occ_blend * profile_occ)
-
-occ_factor  = occupancy / max_occ
-if max_occ == 0:
-    occ_factor = 0.0
+# ─── 8) LIVE SENSOR + PREDICTION VIA BACKEND ML MODEL ───────────────────────────
+def _fallback_pred(hour, temperature, occupancy, is_weekend):
+    """Simple rule used when the backend is down."""
+    return (200.0 + 5.0*temperature + 2.0*occupancy + 20.0*is_weekend
+            + 10.0*math.sin(2*math.pi*(hour - 12.0)/24.0))
 
-temp_factor = min(max((temperature - ideal_temp) / 28, 0), 1)
+def fetch_tick(hour, temperature, profile_occ, occ_blend, is_weekend) -> dict:
+    """Read the live sensor and predict usage in one backend /tick round-trip.
 
-ac_bump     = round(min(1 + occ_factor*2 + temp_factor*2, 5), 1)
-dim_pct     = round(min(10 + occ_factor*30 + temp_factor*20, 60), 0)
-
-# ─── 8) PREDICTION VIA BACKEND ML MODEL ─────────────────────────────────────────────
-def get_backend_prediction(hour, temperature, occupancy, is_weekend):
-    """Call the backend /predict endpoint to use the trained RandomForest model."""
+    The backend blends the sensor occupancy with the IST profile before
+    running the trained RandomForest model on it. Reruns with the same inputs
+    within POLL_S seconds (auto-refresh, ROI/theme widget changes) reuse the
+    last response instead of re-hitting the backend.
+    """
+    key = (hour, temperature, profile_occ, occ_blend, is_weekend)
+    t = time.monotonic()
+    if (t - st.session_state.get("_tick_t", 0.0) < POLL_S - _POLL_JITTER_S
+            and st.session_state.get("_tick_key") == key):
+        return st.session_state["_tick_cache"]
+    tick = _fetch_tick(hour, temperature, profile_occ, occ_blend, is_weekend)
+    st.session_state["_tick_t"] = t
+    st.session_state["_tick_key"] = key
+    st.session_state["_tick_cache"] = tick
+    return tick
+
+def _fetch_tick(hour, temperature, profile_occ, occ_blend, is_weekend) -> dict:
     try:
         payload = {
             "hour": int(hour),
             "temperature": float(temperature),
-            "occupancy": int(occupancy),
+            "profile_occupancy": int(profile_occ),
+            "occ_blend": float(occ_blend),
             "is_weekend": int(is_weekend)
         }
-        resp = requests.post("http://127.0.0.1:5000/predict", json=payload, timeout=2)
+        resp = _http().post(f"{BACKEND_URL}/tick", data=orjson.dumps(payload),
+                            headers=_JSON_HEADERS, timeout=2)
         resp.raise_for_status()
-        data = resp.json()
-        return float(data.get("predicted_usage_kW", 0.0)), data.get("model_type", "unknown"), data.get("temperature_used", temperature)
+        data = orjson.loads(resp.content)
+        status = data.get("status") or {}
+        prediction = data.get("prediction") or {}
+        return {
+            "occupancy_raw": int(status.get("occupancy") or 0),
+            "power_kW": float(status.get("power_kW") or 0.0),
+            "occupancy": int(data.get("occupancy", 0)),
+            "predicted_usage_kW": float(prediction.get("predicted_usage_kW", 0.0)),
+            "model_type": prediction.get("model_type", "unknown"),
+            "temperature_used": prediction.get("temperature_used", temperature),
+        }
     except Exception as e:
-        # Fallback to a simple rule if backend is down
-        print(f"Backend prediction failed: {e}")
-        base = 200.0
-        temp_component = 5.0 * float(temperature)
-        occ_component = 2.0 * float(occupancy)
-        weekend_component = 20.0 * (1 if int(is_weekend) else 0)
-        hour_component = 10.0 * math.sin(2 * math.pi * (float(hour) - 12.0) / 24.0)
-        pred = base + temp_component + occ_component + weekend_component + hour_component
-        return float(pred), "fallback", temperature
-
-pred_usage, model_type_used, temp_used = get_backend_prediction(hour, temperature, occupancy, int(is_weekend))
-
-# ─── DYNAMIC SAFETY BUFFER ───────────────────────────────────────────────────────
-# Cap predicted usage to maintain a dynamic safety margin (15% of current, 10–60 kW)
-buffer_kW = max(10.0, min(60.0, round(0.15 * max(current_usage, 0.0), 1)))
-max_allowed = max(current_usage - buffer_kW, 0.0)
-if pred_usage > max_allowed:
-    pred_usage = max_allowed
-
-# ─── 9) OVERVIEW METRICS ────────────────────────────────────────────────────────
-st.markdown(
-	f"""
-	<div class="metric-card" style="margin-bottom: 1rem;">
-	  <div class="metric-label">Live Store Overview</div>
-	  <div class="metric-value">
-	    {weather['city']} • {temperature:.1f}°C • {occupancy} people • {current_usage:.1f} kW
-	  </div>
-	</div>
-	""",
-	unsafe_allow_html=True,
-)
+        # Fallback to no sensor reading and a simple rule if backend is down
+        print(f"Backend tick failed: {e}")
+        occupancy = int(occ_blend * profile_occ)
+        return {
+            "occupancy_raw": 0,
+            "power_kW": 0.0,
+            "occupancy": occupancy,
+            "predicted_usage_kW": float(_fallback_pred(float(hour), float(temperature), float(occupancy),
+                                                      1.0 if is_weekend else 0.0)),
+            "model_type": "fallback",
+            "temperature_used": temperature,
+        }
 
-st.markdown("##  Overview", unsafe_allow_html=True)
-c1, c2, c3, c4 = st.columns(4, gap="large")
+def recommend(occ: np.ndarray, temp: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """AC setpoint bump (°C) and lighting dim (%) for arrays of occupancy/temperature."""
+    occ_factor  = occ / max_occ if max_occ else np.zeros_like(occ, dtype=float)
+    temp_factor = np.clip((temp - ideal_temp) / 28, 0, 1)
+    ac_bump     = np.minimum(1 + 2*occ_factor + 2*temp_factor, 5)
+    dim_pct     = np.minimum(10 + 30*occ_factor + 20*temp_factor, 60)
+    return ac_bump, dim_pct
+
+# ─── 9) LIVE OVERVIEW & RECOMMENDATIONS (AUTO-REFRESH EVERY 5s) ─────────────────
+@st.fragment(run_every=LIVE_REFRESH_S)
+def live_block():
+    """Sensor read, prediction, overview metrics and recommendations.
+
+    Only this fragment reruns on the 5s timer; CSS, sidebar and the trends
+    chart rerun only when the user interacts with a widget.
+    """
+    # Clock and weather move on between timer ticks, so re-read them here
+    now = datetime.datetime.now(_IST)
+    hour = int(custom_hour if use_custom_time else now.hour)
+    is_weekend = now.weekday() >= 5
+    profile_occ = int(float(_occ_table()[int(is_weekend), hour]) * max_occ)
+    temperature = float(get_weather(city_input, st.session_state.weather_nonce).get("temp", weather["temp"]))
+
+    tick = fetch_tick(hour, round(temperature, 1), profile_occ, occ_blend, bool(is_weekend))
+    occupancy_raw   = tick["occupancy_raw"]
+    current_usage   = tick["power_kW"]
+    occupancy       = tick["occupancy"]
+    pred_usage      = tick["predicted_usage_kW"]
+
+    ac_arr, dim_arr = recommend(np.array([occupancy], dtype=float), np.array([temperature], dtype=float))
+    ac_bump     = round(float(ac_arr[0]), 1)
+    dim_pct     = round(float(dim_arr[0]), 0)
+
+    # Dynamic safety buffer: cap predicted usage to keep a margin (15% of current, 10–60 kW)
+    buffer_kW = max(10.0, min(60.0, round(0.15 * max(current_usage, 0.0), 1)))
+    max_allowed = max(current_usage - buffer_kW, 0.0)
+    if pred_usage > max_allowed:
+        pred_usage = max_allowed
 
-# 1) Current
-c1.metric("Current Usage (kW)", f"{current_usage:.2f}")
+    st.markdown(
+        f"""
+        <div class="metric-card" style="margin-bottom: 1rem;">
+          <div class="metric-label">Live Store Overview</div>
+          <div class="metric-value">
+            {weather['city']} • {temperature:.1f}°C • {occupancy} people • {current_usage:.1f} kW
+          </div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    # Fragments can't write to the sidebar, so the raw sensor reading lives here
+    st.caption(f"Sensor occupancy: {occupancy_raw} people • Power draw: {current_usage:.1f} kW")
 
-# 2) Predicted (with delta always ≤ 0)
-delta = pred_usage - current_usage
-c2.metric("Predicted Usage (kW)", f"{pred_usage:.2f}", delta=f"{delta:+.2f}")
+    st.markdown("##  Overview", unsafe_allow_html=True)
+    c1, c2, c3, c4 = st.columns(4, gap="large")
 
-# 3) Savings %
-if current_usage:
-	savings_pct = max(0.0, (current_usage - pred_usage) / current_usage * 100)
-else:
-	savings_pct = 0.0
-c3.metric("Savings %", f"{savings_pct:.0f}%")
+    # 1) Current
+    c1.metric("Current Usage (kW)", f"{current_usage:.2f}")
 
-# 4) Monthly ₹
-monthly_savings = (savings_pct/100) * current_usage * 24 * 30 * cost_per_kwh * num_stores
-c4.metric("Monthly Savings (₹)", f"{monthly_savings:,.0f}")
+    # 2) Predicted (with delta always ≤ 0)
+    delta = pred_usage - current_usage
+    c2.metric("Predicted Usage (kW)", f"{pred_usage:.2f}", delta=f"{delta:+.2f}")
 
-# ─── 10) AI RECOMMENDATIONS ─────────────────────────────────────────────────────
-st.markdown("##  AI Recommendations")
-if occupancy == 0:
-	st.info("No occupancy detected: dim lights by 60% and set AC to energy-saver mode.")
-else:
-	st.success(f"Increase AC setpoint by +{ac_bump}°C to reduce cooling load.")
-	st.success(f"Dim ambient lighting by {dim_pct}% while maintaining aisle task lighting.")
+    # 3) Savings %
+    if current_usage:
+        savings_pct = max(0.0, (current_usage - pred_usage) / current_usage * 100)
+    else:
+        savings_pct = 0.0
+    c3.metric("Savings %", f"{savings_pct:.0f}%")
+
+    # 4) Monthly ₹
+    monthly_savings = (savings_pct/100) * current_usage * 24 * 30 * cost_per_kwh * num_stores
+    c4.metric("Monthly Savings (₹)", f"{monthly_savings:,.0f}")
+
+    # ─── 10) AI RECOMMENDATIONS ─────────────────────────────────────────────────
+    st.markdown("##  AI Recommendations")
+    if occupancy == 0:
+        st.info("No occupancy detected: dim lights by 60% and set AC to energy-saver mode.")
+    else:
+        st.success(f"Increase AC setpoint by +{ac_bump}°C to reduce cooling load.")
+        st.success(f"Dim ambient lighting by {dim_pct}% while maintaining aisle task lighting.")
+
+live_block()
 
 # ─── 11) TRENDS CHART (REAL DATA SAMPLE) ────────────────────────────────────────
-try:
-	import pandas as pd
-	import altair as alt
-	csv_path = (Path(__file__).resolve().parent / "real_walmart_energy.csv").as_posix()
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_trends(csv_path: str, mtime: float):
+	"""Last 24 rows of the energy CSV with parsed timestamps (mtime keys the cache)."""
 	df = pd.read_csv(csv_path)
 	if "timestamp" not in df.columns:
-		# Fallback: create a synthetic hourly index if missing
+		# Fallback: synthetic hourly index ending now (IST wall time)
 		n = len(df)
-		end = now
-		start = end - datetime.timedelta(hours=n-1)
-		df["timestamp"] = pd.date_range(start, periods=n, freq="h")
-	df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-	st.markdown("##  Energy & Temperature Trends (24h sample)")
-	latest = df.tail(24)
+		end = np.datetime64(datetime.datetime.now(_IST).replace(tzinfo=None))
+		df["timestamp"] = end - np.arange(n-1, -1, -1, dtype="timedelta64[h]")
+	elif not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+		df["timestamp"] = pd.to_datetime(df["timestamp"])
+	return df.tail(24)
+
+@st.cache_resource(show_spinner=False)
+def build_trends_chart(csv_path: str, mtime: float, accent_hex: str):
+	"""Layered usage/temperature chart, rebuilt only when the CSV mtime or accent changes.
+
+	Keyed on the scalars rather than the DataFrame so a rerun doesn't re-hash
+	the data; only the plotted columns are embedded in the chart spec.
+	"""
+	latest = load_trends(csv_path, mtime)[["timestamp", "energy_kW", "temperature"]]
 	base = alt.Chart(latest).encode(x="timestamp:T")
 	usage_line = base.mark_line(color=accent_hex, strokeWidth=2).encode(
 		y=alt.Y("energy_kW:Q", axis=alt.Axis(title="kW")),
@@ -354,10 +474,19 @@ try:
 		),
 		tooltip=["timestamp", "temperature"],
 	)
-	chart = alt.layer(usage_line, temp_line).resolve_scale(y="independent")
+	return alt.layer(usage_line, temp_line).resolve_scale(y="independent")
+
+csv_path = Path(__file__).resolve().parent / "real_walmart_energy.csv"
+try:
+	chart = build_trends_chart(csv_path.as_posix(), csv_path.stat().st_mtime, accent_hex)
+except (OSError, KeyError, pd.errors.EmptyDataError):
+	chart = None
+
+if chart is None:
+	st.info("Trend chart unavailable (ensure real_walmart_energy.csv exists).")
+else:
+	st.markdown("##  Energy & Temperature Trends (24h sample)")
 	st.altair_chart(chart, use_container_width=True)
-except Exception:
-	st.info("Trend chart unavailable (install pandas/altair and ensure real_walmart_energy.csv exists).")
 
 # ─── 13) FOOTER ──────────────────────────────────────────────────────────────────
 st.markdown(
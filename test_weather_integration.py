@@ -12,7 +12,11 @@ def test_weather_service():
     """Test the weather service directly"""
     print("🌡️  Testing weather service...")
     try:
-        from backend.weather_service import get_current_temperature, get_weather_info
+        from backend.weather_service import get_current_temperature, get_weather_info, weather_service
+        
+        # Fetch synchronously once; normally the background thread does this
+        if weather_service.api_key:
+            weather_service._refresh()
         
         temp = get_current_temperature()
         print(f"   Current temperature: {temp}°C")